@@ -1,6 +1,7 @@
 """
 Bot configuration settings
 """
+import functools
 import os
 from dotenv import load_dotenv
 
@@ -10,7 +11,7 @@ load_dotenv()
 BOT_TOKEN = os.getenv("8306300764:AAHW32LignvebTsLcQA4Cuar9sQrX9mnvkc") #(bot token revoke qilingan)
 
 # Moderation settings
-FORBIDDEN_WORDS = ["ko't", "ahmoq", "so'z1", "so'z2" "so'kinish2", "yomonso'z"]
+FORBIDDEN_WORDS = ["ko't", "ahmoq", "so'z1", "so'z2", "so'kinish2", "yomonso'z"]
 
 # Progressive punishment durations (in seconds)
 PUNISHMENT_DURATIONS = {
@@ -42,6 +43,7 @@ GROUP_NOTIFICATION_TEMPLATE = """🚫 **Foydalanuvchi bloklandi**
 
 _Bu xabar foydalanuvchi blokdan chiqgach o'chadi._"""
 
+@functools.lru_cache(maxsize=64)
 def format_duration(seconds):
     """Format duration in human readable format"""
     if seconds < 60:
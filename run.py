@@ -3,13 +3,20 @@ Telegram Moderation Bot using Aiogram 3
 Blocks users for using forbidden words in groups
 """
 import asyncio
+import heapq
 import logging
+import logging.handlers
+import queue
+import re
 import time
-from datetime import datetime, timedelta
-from typing import List, Dict, Set
-from collections import defaultdict
+from typing import List, Dict, Set, Optional
+from collections import deque
+
+from aiolimiter import AsyncLimiter
+from cachetools import TTLCache
 
 from aiogram import Bot, Dispatcher, F
+from aiogram.client.session.aiohttp import AiohttpSession
 from aiogram.types import Message, ChatPermissions
 from aiogram.types import User
 from aiogram.enums import ChatType
@@ -19,90 +26,171 @@ from config import (
     VIOLATION_WINDOW, BLOCKED_MESSAGE_TEMPLATE, GROUP_NOTIFICATION_TEMPLATE, format_duration
 )
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging: records go through a queue and are formatted and
+# written on a background thread instead of blocking the event loop
+_log_queue = queue.SimpleQueue()
+logging.basicConfig(level=logging.INFO, handlers=[logging.handlers.QueueHandler(_log_queue)])
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_handler)
+_log_listener.start()
 logger = logging.getLogger(__name__)
 
 # Initialize bot and dispatcher
 if not BOT_TOKEN:
     raise ValueError("BOT_TOKEN is required")
 
-bot = Bot(token=BOT_TOKEN)
+# Widen the connection pool and keep connections warm so a burst of
+# delete/restrict/send calls reuses TLS sessions instead of re-handshaking.
+# AiohttpSession exposes no public knob for this, so update the kwargs it
+# passes to its TCPConnector.
+_session = AiohttpSession()
+_session._connector_init.update(limit=200, limit_per_host=100, keepalive_timeout=75)
+
+bot = Bot(token=BOT_TOKEN, session=_session)
 dp = Dispatcher()
 
+# Punishment durations as a tuple indexed by clamped violation count
+_PUNISHMENTS = (
+    PUNISHMENT_DURATIONS[1],
+    PUNISHMENT_DURATIONS[2],
+    PUNISHMENT_DURATIONS[3],
+    PUNISHMENT_DURATIONS[4]
+)
+
+# Permissions applied to restricted users — constant, so built once
+_DENY_ALL_PERMISSIONS = ChatPermissions(
+    can_send_messages=False,
+    can_send_media_messages=False,
+    can_send_polls=False,
+    can_send_other_messages=False,
+    can_add_web_page_previews=False,
+    can_change_info=False,
+    can_invite_users=False,
+    can_pin_messages=False
+)
+
 
 class ModerationBot:
     """Main moderation bot class"""
 
     def __init__(self):
+        # A missing comma in config silently concatenates adjacent literals
+        # into one overlong word that matches nothing — fail loudly instead
+        assert all(0 < len(word) <= 32 for word in FORBIDDEN_WORDS), \
+            "suspicious forbidden word length — missing comma in FORBIDDEN_WORDS?"
         self.forbidden_words = [word.lower() for word in FORBIDDEN_WORDS]
-        # Store user violations: user_id -> list of timestamps
-        self.user_violations = defaultdict(list)
+        # One precompiled case-insensitive alternation: scans the message in a
+        # single C-level pass without lowercasing a copy of it first.
+        # Longest words first so overlapping entries resolve to the longest
+        # match; the lookarounds require the word to stand on its own instead
+        # of flagging it inside longer innocent tokens.
+        self._pattern = re.compile(
+            r"(?<!\w)("
+            + "|".join(re.escape(word) for word in sorted(self.forbidden_words, key=len, reverse=True))
+            + r")(?!\w)",
+            re.IGNORECASE | re.UNICODE
+        )
+        # First characters of forbidden words (both cases): cheap reject for clean messages
+        self._trigger_chars = frozenset(word[0] for word in self.forbidden_words) | \
+            frozenset(word[0].upper() for word in self.forbidden_words)
+        # Messages shorter than the shortest forbidden word cannot match at all
+        self._min_word_len = min(len(word) for word in self.forbidden_words)
+        # Store user violations: user_id -> deque of timestamps (oldest first).
+        # TTLCache evicts users with no violation in the last 24 hours, so
+        # memory stays flat instead of keeping a deque per user forever.
+        self.user_violations = TTLCache(maxsize=100_000, ttl=VIOLATION_WINDOW)
+        # Warning templates pre-substituted per violation count: duration and
+        # count come from a small fixed domain, so only the per-offense fields
+        # are formatted when a message is actually sent
+        self._private_templates = {}
+        self._group_templates = {}
+        for count in range(1, 21):
+            duration_text = format_duration(PUNISHMENT_DURATIONS[min(count, 4)])
+            self._private_templates[count] = BLOCKED_MESSAGE_TEMPLATE \
+                .replace("{duration}", duration_text).replace("{count}", str(count))
+            self._group_templates[count] = GROUP_NOTIFICATION_TEMPLATE \
+                .replace("{duration}", duration_text).replace("{count}", str(count))
         # Store admin notification messages for delayed deletion: user_id -> (message_id, chat_id, duration)
         self.admin_notifications = {}
+        # Pending notification deletions: heap of (expiry timestamp, user_id),
+        # drained by a single background worker instead of one task per restriction
+        self._expiry_heap = []
+        self._expiry_event = asyncio.Event()
+        # Outbound rate limits: Telegram allows ~30 msg/s bot-wide and
+        # ~20 msg/min per group — stay just under both to avoid flood waits
+        self._global_limiter = AsyncLimiter(28, 1)
+        self._chat_limiters = {}
+
+    def _chat_limiter(self, chat_id: int) -> AsyncLimiter:
+        """Get or create the per-chat flood limiter"""
+        limiter = self._chat_limiters.get(chat_id)
+        if limiter is None:
+            limiter = self._chat_limiters[chat_id] = AsyncLimiter(19, 60)
+        return limiter
+
+    async def api_call(self, chat_id: int, call):
+        """Await an outbound Telegram call under the bot-wide and per-chat limiters"""
+        async with self._global_limiter, self._chat_limiter(chat_id):
+            return await call
 
     def clean_old_violations(self, user_id: int) -> None:
         """Remove violations older than 24 hours"""
-        current_time = time.time()
-        self.user_violations[user_id] = [
-            timestamp for timestamp in self.user_violations[user_id]
-            if current_time - timestamp < VIOLATION_WINDOW
-        ]
+        violations = self.user_violations.get(user_id)
+        if not violations:
+            return
+        cutoff = time.time() - VIOLATION_WINDOW
+        while violations and violations[0] < cutoff:
+            violations.popleft()
 
     def get_violation_count(self, user_id: int) -> int:
         """Get current violation count for user in last 24 hours"""
         self.clean_old_violations(user_id)
-        return len(self.user_violations[user_id])
+        violations = self.user_violations.get(user_id)
+        return len(violations) if violations else 0
 
     def add_violation(self, user_id: int) -> int:
         """Add new violation and return total count"""
+        violations = self.user_violations.get(user_id)
+        if violations is None:
+            violations = deque()
         current_time = time.time()
-        self.user_violations[user_id].append(current_time)
-        return self.get_violation_count(user_id)
+        violations.append(current_time)
+        # Re-assign so the cache refreshes this user's TTL
+        self.user_violations[user_id] = violations
+        cutoff = current_time - VIOLATION_WINDOW
+        while violations[0] < cutoff:
+            violations.popleft()
+        return len(violations)
 
     def get_punishment_duration(self, violation_count: int) -> int:
-        """Get punishment duration based on violation count"""
-        if violation_count <= 4:
-            return PUNISHMENT_DURATIONS[violation_count]
-        else:
-            # After 4 violations, always 1 day
-            return PUNISHMENT_DURATIONS[4]
+        """Get punishment duration based on violation count (capped at the 4th tier)"""
+        return _PUNISHMENTS[min(violation_count, 4) - 1]
 
-    def contains_forbidden_word(self, text: str) -> tuple:
-        """Check if text contains any forbidden words. Returns (is_forbidden, word)"""
-        if not text:
-            return False, None
+    def contains_forbidden_word(self, text: str) -> Optional[str]:
+        """Return the forbidden word found in text, or None if it is clean"""
+        if not text or len(text) < self._min_word_len:
+            return None
 
-        text_lower = text.lower()
-        for word in self.forbidden_words:
-            if word in text_lower:
-                return True, word
-        return False, None
+        if self._trigger_chars.isdisjoint(text):
+            return None
+        match = self._pattern.search(text)
+        if match:
+            return match.group(1).lower()
+        return None
 
     async def restrict_user(self, chat_id: int, user_id: int, duration: int) -> bool:
         """Restrict user from sending messages for specified duration"""
         try:
-            # Set permissions to block user from sending messages
-            permissions = ChatPermissions(
-                can_send_messages=False,
-                can_send_media_messages=False,
-                can_send_polls=False,
-                can_send_other_messages=False,
-                can_add_web_page_previews=False,
-                can_change_info=False,
-                can_invite_users=False,
-                can_pin_messages=False
-            )
+            # Calculate until when to restrict (Unix timestamp, accepted by the API)
+            until_date = int(time.time()) + duration
 
-            # Calculate until when to restrict
-            until_date = datetime.now() + timedelta(seconds=duration)
-
-            await bot.restrict_chat_member(
+            await self.api_call(chat_id, bot.restrict_chat_member(
                 chat_id=chat_id,
                 user_id=user_id,
-                permissions=permissions,
+                permissions=_DENY_ALL_PERMISSIONS,
                 until_date=until_date
-            )
+            ))
 
             logger.info(f"User {user_id} restricted in chat {chat_id} for {duration} seconds")
             return True
@@ -114,16 +202,20 @@ class ModerationBot:
     async def send_private_warning(self, user_id: int, word: str, duration: int, violation_count: int) -> bool:
         """Send private warning message to user"""
         try:
-            message = BLOCKED_MESSAGE_TEMPLATE.format(
-                word=word,
-                duration=format_duration(duration),
-                count=violation_count
-            )
-
-            await bot.send_message(
+            template = self._private_templates.get(violation_count)
+            if template is not None:
+                message = template.format(word=word)
+            else:
+                message = BLOCKED_MESSAGE_TEMPLATE.format(
+                    word=word,
+                    duration=format_duration(duration),
+                    count=violation_count
+                )
+
+            await self.api_call(user_id, bot.send_message(
                 chat_id=user_id,
                 text=message
-            )
+            ))
             logger.info(f"Warning sent to user {user_id} for word '{word}', violation #{violation_count}")
             return True
 
@@ -135,20 +227,24 @@ class ModerationBot:
                                       violation_count: int) -> None:
         """Send notification to group about user restriction"""
         try:
-            message = GROUP_NOTIFICATION_TEMPLATE.format(
-                user_name=user_name,
-                user_id=user_id,
-                word=word,
-                duration=format_duration(duration),
-                count=violation_count
-            )
+            template = self._group_templates.get(violation_count)
+            if template is not None:
+                message = template.format(user_name=user_name, user_id=user_id, word=word)
+            else:
+                message = GROUP_NOTIFICATION_TEMPLATE.format(
+                    user_name=user_name,
+                    user_id=user_id,
+                    word=word,
+                    duration=format_duration(duration),
+                    count=violation_count
+                )
 
             # Send notification to group
-            notification_msg = await bot.send_message(
+            notification_msg = await self.api_call(chat_id, bot.send_message(
                 chat_id=chat_id,
                 text=message,
                 parse_mode="Markdown"
-            )
+            ))
 
             logger.info(
                 f"Group notification sent for user {user_name} (#{user_id}) - word: '{word}', violation #{violation_count}")
@@ -162,38 +258,57 @@ class ModerationBot:
             }
 
             # Schedule deletion after restriction ends
-            asyncio.create_task(self.delete_group_notification_after_unblock(user_id, duration))
+            heapq.heappush(self._expiry_heap, (time.time() + duration, user_id))
+            self._expiry_event.set()
 
         except Exception as e:
             logger.error(f"Failed to send group notification: {e}")
 
-    async def delete_group_notification_after_unblock(self, user_id: int, duration: int) -> None:
-        """Delete group notification message after user is unblocked"""
-        try:
-            # Wait for the restriction duration
-            await asyncio.sleep(duration)
-
-            # Check if we have stored notification for this user
-            if user_id in self.admin_notifications:
-                notification_data = self.admin_notifications[user_id]
-
-                # Delete the stored message
-                try:
-                    await bot.delete_message(
-                        chat_id=notification_data['chat_id'],
-                        message_id=notification_data['message_id']
-                    )
-                    logger.info(f"Deleted group notification message for user {user_id}")
-                except Exception as e:
-                    logger.error(f"Failed to delete group notification for user {user_id}: {e}")
-
-                # Remove from storage
-                del self.admin_notifications[user_id]
-                logger.info(f"Cleaned up notification for user {user_id}")
+    async def delete_group_notification(self, user_id: int) -> None:
+        """Delete the stored group notification message for an unblocked user"""
+        notification_data = self.admin_notifications.pop(user_id, None)
+        if not notification_data:
+            return
 
+        try:
+            await self.api_call(notification_data['chat_id'], bot.delete_message(
+                chat_id=notification_data['chat_id'],
+                message_id=notification_data['message_id']
+            ))
+            logger.info(f"Deleted group notification message for user {user_id}")
         except Exception as e:
             logger.error(f"Failed to delete group notification for user {user_id}: {e}")
 
+    async def notification_expiry_worker(self) -> None:
+        """Single background task that deletes notifications as restrictions expire"""
+        while True:
+            if not self._expiry_heap:
+                await self._expiry_event.wait()
+                self._expiry_event.clear()
+                continue
+
+            delay = self._expiry_heap[0][0] - time.time()
+            if delay > 0:
+                # Sleep until the next expiry, waking early if a sooner one is pushed
+                try:
+                    await asyncio.wait_for(self._expiry_event.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                else:
+                    self._expiry_event.clear()
+                continue
+
+            # Drain everything already due in one go — a mass-offense burst
+            # expires together, so its deletions are issued concurrently
+            # (still throttled by the outbound limiters) in a single wakeup
+            now = time.time()
+            due = []
+            while self._expiry_heap and self._expiry_heap[0][0] <= now:
+                due.append(heapq.heappop(self._expiry_heap)[1])
+            await asyncio.gather(
+                *(self.delete_group_notification(user_id) for user_id in due)
+            )
+
 
 # Initialize moderation bot
 moderation_bot = ModerationBot()
@@ -208,8 +323,8 @@ async def handle_group_message(message: Message):
         return
 
     # Check for forbidden words
-    is_forbidden, forbidden_word = moderation_bot.contains_forbidden_word(message.text)
-    if is_forbidden:
+    forbidden_word = moderation_bot.contains_forbidden_word(message.text)
+    if forbidden_word:
         if not message.from_user:
             return
 
@@ -223,31 +338,31 @@ async def handle_group_message(message: Message):
         violation_count = moderation_bot.add_violation(user_id)
         duration = moderation_bot.get_punishment_duration(violation_count)
 
-        logger.info(
-            f"Forbidden word '{forbidden_word}' detected from user {user_name} ({user_id}) in chat {chat_id}. Violation #{violation_count}")
-
-        # Try to delete the offensive message
-        try:
-            await message.delete()
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                f"Forbidden word '{forbidden_word}' detected from user {user_name} ({user_id}) in chat {chat_id}. Violation #{violation_count}")
+
+        # Delete the message, restrict the user and warn them in parallel —
+        # the three API calls are independent once the violation is recorded
+        delete_result, restriction_success, _ = await asyncio.gather(
+            moderation_bot.api_call(chat_id, message.delete()),
+            moderation_bot.restrict_user(chat_id, user_id, duration),
+            moderation_bot.send_private_warning(user_id, forbidden_word, duration, violation_count),
+            return_exceptions=True
+        )
+
+        if isinstance(delete_result, Exception):
+            logger.error(f"Habar o'chirishda xatolik: {delete_result}")
+        else:
             logger.info(f"Habar shu foydalanuvchidan o'chirildi: {user_name}")
-        except Exception as e:
-            logger.error(f"Habar o'chirishda xatolik: {e}")
-
-        # Restrict the user
-        restriction_success = await moderation_bot.restrict_user(chat_id, user_id, duration)
 
-        if restriction_success:
+        if restriction_success is True:
             # Send group notification (in background task)
             asyncio.create_task(
                 moderation_bot.send_group_notification(chat_id, user_id, user_name, forbidden_word, duration,
                                                        violation_count)
             )
 
-            # Send private warning (in background)
-            asyncio.create_task(
-                moderation_bot.send_private_warning(user_id, forbidden_word, duration, violation_count)
-            )
-
 
 @dp.message(F.chat.type == ChatType.PRIVATE)
 async def handle_private_message(message: Message):
@@ -259,12 +374,16 @@ async def main():
     """Main function to start the bot"""
     logger.info("Telegram moderatsiya boti ishga tushyabdi...")
 
+    # Single worker that deletes group notifications when restrictions expire
+    expiry_task = asyncio.create_task(moderation_bot.notification_expiry_worker())
+
     try:
         # Start polling
         await dp.start_polling(bot)
     except Exception as e:
         logger.error(f"Bot shu xatolik bilan to'xtadi: {e}")
     finally:
+        expiry_task.cancel()
         await bot.session.close()
 
 